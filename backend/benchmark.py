@@ -0,0 +1,316 @@
+"""
+Offline regression benchmark for prompt variants.
+
+Replays a fixed set of locations against recorded (or stubbed) model outputs
+for every version of a prompt in the registry and reports, per variant, output
+tokens, latency, parse/repair success and schema completeness.
+
+    python benchmark.py --prompt research             # replay recordings
+    python benchmark.py --prompt research --stub      # synthetic outputs, no network
+    python benchmark.py --prompt research --record    # call one pinned model and record
+
+Recordings live in benchmarks/recordings/<prompt_id>/<version>/<location>.json.
+Recording goes through a single pinned provider:model (--model) with hedging
+disabled, so every variant is measured against the same model. Schema
+completeness scores every version of a prompt against the example output of
+its default version, so the column is comparable across variants.
+
+Stub runs feed every synthetic scenario to every variant: they exercise the
+parsing pipeline and are not a basis for choosing between variants.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+
+from llm import PROVIDER_NAMES, FakeProvider, Route, Router, estimate_tokens
+from model_output import parse_model_json
+from prompt_registry import registry
+
+LOCATIONS = [
+    "Cortina d'Ampezzo",
+    "Livigno",
+    "Cervinia",
+    "Madonna di Campiglio",
+    "Courmayeur",
+    "Val Gardena",
+]
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "recordings")
+
+DEFAULT_MODEL = "gemini:gemini-2.5-flash"
+
+# Router endpoint serving each prompt
+ENDPOINTS = {
+    "research": "research",
+    "tags-wizard": "generate-tags",
+    "tags-seo": "generate-tags",
+    "tags-full": "generate-tags",
+    "translate": "translate",
+}
+
+# Synthetic model behaviours for --stub: (name, latency in seconds)
+STUB_SCENARIOS = [
+    ("clean", 0.05),
+    ("fenced", 0.08),
+    ("trailing-commas", 0.10),
+    ("missing-fields", 0.04),
+    ("control-chars", 0.12),
+    ("unparseable", 0.30),
+]
+
+
+def translate_content(location_name: str) -> dict:
+    return {"name": location_name, "description": f"Località alpina: {location_name}"}
+
+
+def render_kwargs(prompt_id: str, location_name: str) -> dict:
+    if prompt_id == "research":
+        return {"location_name": location_name, "user_instructions": "Estrai il report completo."}
+    if prompt_id == "translate":
+        content = json.dumps(translate_content(location_name), ensure_ascii=False)
+        return {"target_language": "English", "content": content}
+    return {"location_name": location_name, "context": f"Location: {location_name}\n", "target_lang": "Italian"}
+
+
+def expected_schema(prompt, location_name: str):
+    """
+    What a complete answer looks like, shared by every version of the prompt:
+    the default version's example output. None when the prompt defines no shape.
+    """
+    if prompt.id == "translate":
+        # A translation must keep every key of its input
+        return translate_content(location_name)
+    return registry.get(prompt.id).schema
+
+
+def slugify(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def recording_path(prompt_id: str, version: str, location_name: str) -> str:
+    return os.path.join(RECORDINGS_DIR, prompt_id, version, f"{slugify(location_name)}.json")
+
+
+def schema_completeness(schema, output) -> float:
+    """Fraction of the leaf fields in the expected output filled in by the model."""
+    leaves = []
+
+    def walk(expected, actual):
+        if isinstance(expected, dict) and expected:
+            for key, value in expected.items():
+                walk(value, actual.get(key) if isinstance(actual, dict) else None)
+        else:
+            leaves.append(actual not in (None, "", [], {}))
+
+    walk(schema, output)
+    return sum(leaves) / len(leaves) if leaves else 1.0
+
+
+def stub_output(scenario: str, schema) -> str:
+    schema = schema or {}
+    text = json.dumps(schema, ensure_ascii=False, indent=2)
+    if scenario == "fenced":
+        return f"Ecco il report richiesto:\n```json\n{text}\n```"
+    if scenario == "trailing-commas":
+        return re.sub(r'(["\d\]}])(\n\s*[}\]])', r'\1,\2', text)
+    if scenario == "missing-fields":
+        return json.dumps({k: v for i, (k, v) in enumerate(schema.items()) if i % 2 == 0}, ensure_ascii=False, indent=2)
+    if scenario == "control-chars":
+        # Raw tab inside a string value: rejected by the parser, fixed by the repair pass
+        return text.replace('": "', '": "\t', 1)
+    if scenario == "unparseable":
+        return text[:len(text) // 2]
+    return text
+
+
+def stub_router(prompt_id: str, text: str, delay: float) -> Router:
+    provider = FakeProvider("fake", default=text, default_delay=delay)
+    route = Route(tiers=[("fake", "stub")], deadline=60.0, default_hedge_after=60.0)
+    return Router({"fake": provider}, {ENDPOINTS[prompt_id]: route}, hedge_budget=0)
+
+
+def pinned_router(model: str, deadline: float) -> Router:
+    """One provider:model for every endpoint, no hedging or fallback."""
+    from dotenv import load_dotenv
+    from llm import build_providers
+
+    provider_name, _, model_name = model.partition(":")
+    if provider_name not in PROVIDER_NAMES or not model_name:
+        raise SystemExit(f"--model must be provider:model with provider in {', '.join(PROVIDER_NAMES)}")
+    load_dotenv()
+    providers = build_providers()
+    if provider_name not in providers:
+        raise SystemExit(f"Provider '{provider_name}' is not configured (missing API key?)")
+    route = Route(tiers=[(provider_name, model_name)], deadline=deadline, default_hedge_after=deadline)
+    return Router(providers, {endpoint: route for endpoint in set(ENDPOINTS.values())}, hedge_budget=0)
+
+
+async def run_variant(prompt, locations, mode: str, router: Router = None) -> dict:
+    results = []
+    missing = 0
+    errors = 0
+    if mode == "stub":
+        cases = [(location_name, scenario) for location_name in locations for scenario in STUB_SCENARIOS]
+    else:
+        cases = [(location_name, None) for location_name in locations]
+
+    for location_name, scenario in cases:
+        path = recording_path(prompt.id, prompt.version, location_name)
+        if mode == "replay":
+            if not os.path.exists(path):
+                missing += 1
+                continue
+            with open(path) as f:
+                recorded = json.load(f)
+            text, latency, output_tokens = recorded["text"], recorded.get("latency"), recorded.get("output_tokens")
+            model = f"{recorded.get('provider')}:{recorded.get('model')}"
+        else:
+            if mode == "stub":
+                # The stub answers with what this variant's own prompt asks for
+                name, delay = scenario
+                own_schema = translate_content(location_name) if prompt.id == "translate" else prompt.schema
+                router = stub_router(prompt.id, stub_output(name, own_schema), delay)
+            try:
+                completion = await router.generate(
+                    ENDPOINTS[prompt.id],
+                    prompt.render(**render_kwargs(prompt.id, location_name)),
+                    json_mode=prompt.id != "translate"
+                )
+            except Exception as e:
+                print(f"Benchmark Error ({prompt.id}@{prompt.version}, {location_name}): {e}")
+                errors += 1
+                continue
+            text, latency, output_tokens = completion.text, completion.latency, completion.output_tokens
+            model = f"{completion.provider}:{completion.model}"
+            if mode == "record":
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    json.dump({
+                        "text": text,
+                        "latency": latency,
+                        "output_tokens": output_tokens,
+                        "provider": completion.provider,
+                        "model": completion.model,
+                    }, f, ensure_ascii=False, indent=2)
+
+        schema = expected_schema(prompt, location_name)
+        try:
+            parsed = parse_model_json(text)
+            status = "repaired" if parsed.repaired else "parsed"
+            completeness = schema_completeness(schema, parsed.data) if schema else None
+        except json.JSONDecodeError:
+            status, completeness = "failed", 0.0 if schema else None
+
+        results.append({
+            "model": model,
+            "output_tokens": output_tokens or estimate_tokens(text),
+            "latency": latency,
+            "status": status,
+            "completeness": completeness,
+        })
+
+    row = summarize(prompt, results, missing, errors)
+    row["synthetic"] = mode == "stub"
+    return row
+
+
+def summarize(prompt, results, missing: int, errors: int = 0) -> dict:
+    runs = len(results)
+    latencies = sorted(r["latency"] for r in results if r["latency"] is not None)
+    tokens = [r["output_tokens"] for r in results]
+    completeness = [r["completeness"] for r in results if r["completeness"] is not None]
+
+    def share(status):
+        return sum(r["status"] == status for r in results) / runs if runs else 0.0
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+
+    return {
+        "prompt": prompt.meta,
+        "models": sorted({r["model"] for r in results}),
+        "runs": runs,
+        "missing": missing,
+        "errors": errors,
+        "output_tokens_mean": statistics.mean(tokens) if tokens else None,
+        "latency_p50": percentile(0.5),
+        "latency_p95": percentile(0.95),
+        "parsed": share("parsed"),
+        "repaired": share("repaired"),
+        "failed": share("failed"),
+        "completeness_mean": statistics.mean(completeness) if completeness else None,
+    }
+
+
+def print_report(report, prompt_id: str):
+    def fmt(value, spec, width):
+        return format(value, f">{width}{spec}") if value is not None else "-".rjust(width)
+
+    header = (
+        f"{'variant':<22}{'model':<28}{'runs':>6}{'miss':>6}{'err':>6}{'out tok':>10}{'p50 s':>8}{'p95 s':>8}"
+        f"{'parsed':>8}{'repair':>8}{'failed':>8}{'schema':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in report:
+        variant = f"{row['prompt']['id']}@{row['prompt']['version']}"
+        models = ", ".join(row["models"]) or "-"
+        print(
+            f"{variant:<22}{models:<28}{row['runs']:>6}{row['missing']:>6}{row['errors']:>6}"
+            f"{fmt(row['output_tokens_mean'], '.0f', 10)}{fmt(row['latency_p50'], '.2f', 8)}{fmt(row['latency_p95'], '.2f', 8)}"
+            f"{row['parsed']:>8.0%}{row['repaired']:>8.0%}{row['failed']:>8.0%}{fmt(row['completeness_mean'], '.0%', 8)}"
+        )
+    print()
+    if prompt_id == "translate":
+        print("schema: share of the input keys kept in the translation")
+    else:
+        print(f"schema: scored against the example output of {prompt_id}@{registry.default_version(prompt_id)}")
+    if any(row.get("synthetic") for row in report):
+        print("SYNTHETIC: stub outputs, every scenario for every variant; do not compare variants on these rows")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare prompt variants on cost, speed and output quality.")
+    parser.add_argument("--prompt", default="research", choices=registry.ids())
+    parser.add_argument("--versions", nargs="*", help="Versions to compare (default: all registered)")
+    parser.add_argument("--locations", help="JSON file with a list of location names")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--stub", action="store_true", help="Synthetic outputs: fenced, trailing commas, missing fields, broken JSON")
+    mode.add_argument("--record", action="store_true", help="Call the pinned model and save its outputs")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"provider:model used by --record (default: {DEFAULT_MODEL})")
+    parser.add_argument("--deadline", type=float, default=300.0, help="Per-call deadline in seconds for --record")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    locations = LOCATIONS
+    if args.locations:
+        with open(args.locations) as f:
+            locations = json.load(f)
+
+    mode = "stub" if args.stub else "record" if args.record else "replay"
+    router = pinned_router(args.model, args.deadline) if args.record else None
+
+    report = []
+    for version in args.versions or registry.versions(args.prompt):
+        prompt = registry.get(args.prompt, version)
+        report.append(await run_variant(prompt, locations, mode, router))
+
+    if mode == "replay" and not any(row["runs"] for row in report):
+        print(
+            f"No recordings for '{args.prompt}' under {RECORDINGS_DIR}. "
+            "Run with --record (needs an API key) or --stub.",
+            file=sys.stderr
+        )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.prompt)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
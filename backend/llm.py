@@ -0,0 +1,411 @@
+"""
+Provider/model routing for the AI endpoints.
+
+Each endpoint has its own ordered list of model tiers, tried in that order
+unless a tier is unhealthy or its observed p95 latency exceeds the endpoint's
+SLO. A call gets a deadline; when the first model has not answered within its
+p95 a hedged request is fired to the fastest healthy alternate (possibly on
+another provider) and whichever answers first wins. Hedges are capped by a
+per-endpoint budget so slow tails are cut without paying twice for every request.
+
+Providers are selected from the environment:
+    GEMINI_API_KEY / OPENAI_API_KEY   enable the Gemini / OpenAI providers
+    LLM_FAKE=1                        replace every provider with a local FakeProvider
+    LLM_FAKE_DELAY                    latency of the fake providers in seconds (default 0)
+    LLM_<ENDPOINT>_MODELS             override tiers, e.g. "gemini:gemini-2.5-pro,openai:gpt-4.1"
+    LLM_<ENDPOINT>_DEADLINE           override the deadline in seconds
+    LLM_<ENDPOINT>_SLO                override the p95 latency SLO in seconds
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class Completion:
+    text: str
+    provider: str
+    model: str
+    latency: float
+    output_tokens: Optional[int] = None
+    hedged: bool = False
+
+
+class ProviderError(Exception):
+    pass
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough average for mixed Italian/English text and JSON, used when a provider reports no usage
+    return max(1, len(text) // 4)
+
+
+class Provider:
+    name = "base"
+
+    async def generate(self, model: str, prompt: str, json_mode: bool = True) -> Completion:
+        raise NotImplementedError
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+
+    async def generate(self, model, prompt, json_mode=True):
+        generation_config = {"response_mime_type": "application/json"} if json_mode else None
+        response = await self._genai.GenerativeModel(model).generate_content_async(
+            prompt,
+            generation_config=generation_config
+        )
+        usage = getattr(response, "usage_metadata", None)
+        return Completion(
+            text=response.text,
+            provider=self.name,
+            model=model,
+            latency=0.0,
+            output_tokens=getattr(usage, "candidates_token_count", None),
+        )
+
+
+class OpenAIProvider(Provider):
+    name = "openai"
+
+    def __init__(self, api_key: str):
+        from openai import AsyncOpenAI
+
+        self._client = AsyncOpenAI(api_key=api_key)
+
+    async def generate(self, model, prompt, json_mode=True):
+        kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        response = await self._client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            **kwargs
+        )
+        usage = getattr(response, "usage", None)
+        return Completion(
+            text=response.choices[0].message.content or "",
+            provider=self.name,
+            model=model,
+            latency=0.0,
+            output_tokens=getattr(usage, "completion_tokens", None),
+        )
+
+
+class FakeProvider(Provider):
+    """
+    Local provider for tests and offline runs. `responses` maps a model name to
+    the text it returns (or an exception it raises), `delays` to its latency.
+    """
+
+    def __init__(self, name: str = "fake", responses: Dict[str, object] = None,
+                 delays: Dict[str, float] = None, default: object = "{}", default_delay: float = 0.0):
+        self.name = name
+        self.responses = responses or {}
+        self.delays = delays or {}
+        self.default = default
+        self.default_delay = default_delay
+        self.calls: List[str] = []
+
+    async def generate(self, model, prompt, json_mode=True):
+        self.calls.append(model)
+        await asyncio.sleep(self.delays.get(model, self.default_delay))
+        result = self.responses.get(model, self.default)
+        if isinstance(result, Exception):
+            raise result
+        return Completion(
+            text=result,
+            provider=self.name,
+            model=model,
+            latency=0.0,
+            output_tokens=estimate_tokens(str(result)),
+        )
+
+
+class LatencyStats:
+    """Rolling latency window and circuit breaker for one endpoint/provider/model."""
+
+    def __init__(self, window: int = 200, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.latencies = deque(maxlen=window)
+        # Elapsed time of cancelled requests: lower bounds only, kept out of percentile()
+        self.cancelled = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.consecutive_failures = 0
+
+    def record_cancelled(self, elapsed: float):
+        self.cancelled.append(elapsed)
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.cooldown
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < 10:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgeBudget:
+    """Share of one endpoint's calls in the last `window` seconds allowed to fire a hedge."""
+
+    def __init__(self, ratio: float, window: float = 600.0):
+        self.ratio = ratio
+        self.window = window
+        self.calls = deque()
+        self.hedges = deque()
+
+    def _prune(self, now: float):
+        for events in (self.calls, self.hedges):
+            while events and events[0] <= now - self.window:
+                events.popleft()
+
+    def record_call(self):
+        now = time.monotonic()
+        self._prune(now)
+        self.calls.append(now)
+
+    def try_hedge(self) -> bool:
+        now = time.monotonic()
+        self._prune(now)
+        if len(self.hedges) >= self.ratio * len(self.calls):
+            return False
+        self.hedges.append(now)
+        return True
+
+
+@dataclass
+class Route:
+    # Ordered (provider, model) tiers, preferred first
+    tiers: List[tuple]
+    deadline: float
+    # Hedge delay used until enough latency samples exist
+    default_hedge_after: float
+    # A tier whose p95 exceeds this is demoted behind the others (defaults to the deadline)
+    slo: Optional[float] = None
+
+
+DEFAULT_ROUTES = {
+    "research": Route(
+        tiers=[("gemini", "gemini-2.5-pro"), ("openai", "gpt-4.1"), ("gemini", "gemini-2.5-flash")],
+        deadline=120.0,
+        default_hedge_after=60.0,
+        slo=90.0,
+    ),
+    "generate-tags": Route(
+        tiers=[("gemini", "gemini-2.5-flash-lite"), ("openai", "gpt-4.1-mini"), ("gemini", "gemini-2.5-flash")],
+        deadline=30.0,
+        default_hedge_after=10.0,
+        slo=15.0,
+    ),
+    "translate": Route(
+        tiers=[("gemini", "gemini-2.5-flash"), ("openai", "gpt-4.1-mini")],
+        deadline=60.0,
+        default_hedge_after=20.0,
+        slo=40.0,
+    ),
+}
+
+
+class Router:
+    def __init__(self, providers: Dict[str, Provider], routes: Dict[str, Route] = None,
+                 hedge_budget: float = 0.1):
+        self.providers = providers
+        self.routes = routes if routes is not None else DEFAULT_ROUTES
+        # Maximum fraction of each endpoint's calls allowed to fire a hedged request
+        self.hedge_budget = hedge_budget
+        self.stats: Dict[tuple, LatencyStats] = {}
+        self.budgets: Dict[str, HedgeBudget] = {}
+
+    def _stats(self, endpoint: str, target: tuple) -> LatencyStats:
+        # Per endpoint: the same model answers a translation far faster than a research report
+        key = (endpoint, *target)
+        if key not in self.stats:
+            self.stats[key] = LatencyStats()
+        return self.stats[key]
+
+    def _expected_latency(self, endpoint: str, target: tuple) -> float:
+        p95 = self._stats(endpoint, target).percentile(0.95)
+        return p95 if p95 is not None else self.routes[endpoint].default_hedge_after
+
+    def _budget(self, endpoint: str) -> HedgeBudget:
+        if endpoint not in self.budgets:
+            self.budgets[endpoint] = HedgeBudget(self.hedge_budget)
+        return self.budgets[endpoint]
+
+    def _over_slo(self, endpoint: str, target: tuple) -> bool:
+        route = self.routes[endpoint]
+        p95 = self._stats(endpoint, target).percentile(0.95)
+        return p95 is not None and p95 > (route.slo or route.deadline)
+
+    def candidates(self, endpoint: str) -> List[tuple]:
+        """
+        Configured tiers with a provider available, in their configured order.
+        Unhealthy tiers, then tiers whose p95 exceeds the route's SLO, are
+        demoted behind the rest; latency never promotes a tier by itself.
+        """
+        route = self.routes[endpoint]
+        available = [t for t in route.tiers if t[0] in self.providers]
+        return sorted(available, key=lambda t: (
+            not self._stats(endpoint, t).healthy,
+            self._over_slo(endpoint, t),
+        ))
+
+    def available(self, endpoint: str) -> bool:
+        return endpoint in self.routes and bool(self.candidates(endpoint))
+
+    def _hedge_target(self, endpoint: str, queue: List[tuple]) -> tuple:
+        """The alternate expected to answer first, preferring healthy tiers."""
+        healthy = [t for t in queue if self._stats(endpoint, t).healthy] or queue
+        return min(healthy, key=lambda t: self._expected_latency(endpoint, t))
+
+    async def _call(self, endpoint: str, target: tuple, prompt: str, json_mode: bool) -> Completion:
+        provider_name, model = target
+        stats = self._stats(endpoint, target)
+        started = time.monotonic()
+        try:
+            completion = await self.providers[provider_name].generate(model, prompt, json_mode)
+        except asyncio.CancelledError:
+            stats.record_cancelled(time.monotonic() - started)
+            raise
+        except Exception:
+            stats.record_failure()
+            raise
+        stats.record_success(time.monotonic() - started)
+        return completion
+
+    async def generate(self, endpoint: str, prompt: str, json_mode: bool = True,
+                       deadline: float = None) -> Completion:
+        route = self.routes[endpoint]
+        queue = self.candidates(endpoint)
+        if not queue:
+            raise ProviderError(f"No LLM provider configured for '{endpoint}'")
+
+        budget = self._budget(endpoint)
+        budget.record_call()
+        started = time.monotonic()
+        deadline_at = started + (deadline or route.deadline)
+        primary = queue.pop(0)
+        pending = {asyncio.create_task(self._call(endpoint, primary, prompt, json_mode)): primary}
+        hedge_at = time.monotonic() + self._expected_latency(endpoint, primary)
+        hedge_checked = False
+        hedged = False
+        last_error = None
+
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline_at:
+                    raise asyncio.TimeoutError(f"'{endpoint}' exceeded its {deadline or route.deadline:g}s deadline")
+                wait_for = deadline_at - now
+                if not hedge_checked and queue:
+                    wait_for = min(wait_for, max(hedge_at - now, 0))
+
+                done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    provider_name, model = pending.pop(task)
+                    if task.exception() is None:
+                        completion = task.result()
+                        # User-facing latency, including any time lost before a hedge or fallback
+                        completion.latency = time.monotonic() - started
+                        completion.hedged = hedged
+                        return completion
+                    last_error = task.exception()
+                    print(f"LLM Error ({endpoint}, {provider_name}:{model}): {last_error}")
+
+                if done and not pending and queue:
+                    # Every in-flight request failed: fall back straight away
+                    target = queue.pop(0)
+                    pending[asyncio.create_task(self._call(endpoint, target, prompt, json_mode))] = target
+                    hedge_at = time.monotonic() + self._expected_latency(endpoint, target)
+                elif not done and not hedge_checked and time.monotonic() >= hedge_at:
+                    hedge_checked = True
+                    # Without an alternate or hedge budget left, keep waiting on the primary
+                    if queue and budget.try_hedge():
+                        target = self._hedge_target(endpoint, queue)
+                        queue.remove(target)
+                        print(f"Hedging '{endpoint}' to {target[0]}:{target[1]}")
+                        hedged = True
+                        pending[asyncio.create_task(self._call(endpoint, target, prompt, json_mode))] = target
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error or ProviderError(f"All providers failed for '{endpoint}'")
+
+
+PROVIDER_NAMES = ("gemini", "openai")
+
+
+def _parse_tiers(variable: str, value: str) -> List[tuple]:
+    tiers = []
+    for item in value.split(","):
+        item = item.strip()
+        provider_name, _, model = item.partition(":")
+        if not provider_name or not model:
+            raise ValueError(f"{variable}: '{item}' is not in the form provider:model")
+        if provider_name not in PROVIDER_NAMES:
+            raise ValueError(
+                f"{variable}: unknown provider '{provider_name}' (expected one of: {', '.join(PROVIDER_NAMES)})"
+            )
+        tiers.append((provider_name, model))
+    return tiers
+
+
+def _routes_from_env() -> Dict[str, Route]:
+    routes = {}
+    for endpoint, route in DEFAULT_ROUTES.items():
+        key = endpoint.upper().replace("-", "_")
+        tiers = route.tiers
+        override = os.environ.get(f"LLM_{key}_MODELS")
+        if override:
+            tiers = _parse_tiers(f"LLM_{key}_MODELS", override)
+        deadline = float(os.environ.get(f"LLM_{key}_DEADLINE", route.deadline))
+        slo = float(os.environ.get(f"LLM_{key}_SLO", route.slo or deadline))
+        routes[endpoint] = Route(
+            tiers=tiers,
+            deadline=deadline,
+            default_hedge_after=min(route.default_hedge_after, deadline / 2),
+            slo=min(slo, deadline),
+        )
+    return routes
+
+
+def build_providers() -> Dict[str, Provider]:
+    if os.environ.get("LLM_FAKE") == "1":
+        delay = float(os.environ.get("LLM_FAKE_DELAY", 0))
+        print("WARNING: LLM_FAKE=1, all model calls are answered by local fake providers.")
+        return {name: FakeProvider(name, default_delay=delay) for name in PROVIDER_NAMES}
+
+    providers = {}
+    if os.environ.get("GEMINI_API_KEY"):
+        providers["gemini"] = GeminiProvider(os.environ["GEMINI_API_KEY"])
+    if os.environ.get("OPENAI_API_KEY"):
+        providers["openai"] = OpenAIProvider(os.environ["OPENAI_API_KEY"])
+    return providers
+
+
+def build_router() -> Router:
+    """Router for the API; raises ValueError on a malformed LLM_<ENDPOINT>_MODELS."""
+    routes = _routes_from_env()
+    return Router(build_providers(), routes)
@@ -1,15 +1,24 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
 import uvicorn
 import os
-import re
 import json
 from dotenv import load_dotenv
+from llm import build_router
+from model_output import clean_model_json, parse_model_json
+from prompt_registry import registry as prompt_registry
+from responses import AIResponse, ResultCache, dumps, merge_object, success_envelope
 
 load_dotenv() # Load env vars from .env file
 
+# Routes each endpoint to its model tiers, with deadlines and hedged requests
+router = build_router()
+
+# Latest result per request, re-fetchable with a conditional GET
+result_cache = ResultCache()
+
 app = FastAPI(title="AlpeMatch AI Engine", description="AI Scraper & Data Processor for Mountain Services")
 
 # Allow Frontend to communicate with Backend
@@ -19,6 +28,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Content-Location"],
 )
 
 class ScrapeRequest(BaseModel):
@@ -26,6 +36,7 @@ class ScrapeRequest(BaseModel):
     region: Optional[str] = None
     targets: List[str] = ["tourism", "accommodation"]
     user_instructions: Optional[str] = "" 
+    prompt_version: Optional[str] = None  # defaults to the registry's current version
 
 class TagGenRequest(BaseModel):
     location_name: str
@@ -34,25 +45,47 @@ class TagGenRequest(BaseModel):
     language: Optional[str] = "it"
     current_tags: Optional[dict] = None
     mode: Optional[str] = "full"  # wizard, seo, or full
+    prompt_version: Optional[str] = None
 @app.get("/")
 def health_check():
     return {"status": "ok", "service": "AlpeMatch AI Backend", "version": "0.1.0"}
 
+def cached_response(endpoint: str, request: BaseModel, http_request: Request, body: bytes) -> AIResponse:
+    """Store a result and point the client at the GET URL it can revalidate with If-None-Match."""
+    key = ResultCache.key_for(endpoint, request.model_dump())
+    result_cache.put(key, body)
+    return AIResponse(body, request=http_request, headers={"Content-Location": f"/api/ai/results/{key}"})
+
+@app.get("/api/ai/results/{key}")
+async def get_result(key: str, http_request: Request):
+    """
+    Cached result of an earlier AI call. Answers 304 when If-None-Match
+    matches, so repeat fetches cost neither a model call nor the transfer.
+    """
+    body = result_cache.get(key)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    return AIResponse(body, request=http_request)
+
 @app.post("/api/ai/research")
-async def research_location(request: ScrapeRequest):
+async def research_location(request: ScrapeRequest, http_request: Request):
     """
     Trigger the AI Research Agent with Gemini.
     """
     print(f"Received request for: {request.location_name}")
     
-    # Check for Gemini API Key (set via env var GEMINI_API_KEY)
-    api_key = os.environ.get("GEMINI_API_KEY")
-    
-    if not api_key:
-        print("WARNING: GEMINI_API_KEY not found. Returning MOCK data.")
+    # Check for an LLM API Key (set via env var GEMINI_API_KEY or OPENAI_API_KEY)
+    if not router.available("research"):
+        print("WARNING: GEMINI_API_KEY / OPENAI_API_KEY not found. Returning MOCK data.")
+        try:
+            prompt = prompt_registry.get("research", request.prompt_version)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
         # MOCK RESPONSE for demo purposes or missing key
-        return {
+        return cached_response("research", request, http_request, dumps({
            "status": "success",
+           "prompt": prompt.meta,
+           "model": "mock",
            "data": { 
                "name": request.location_name, 
                "description": {
@@ -107,76 +140,39 @@ async def research_location(request: ScrapeRequest):
                "sustainability": { "energy": "Idroelettrico", "mobility": "Bus Elettrici", "certifications": "ISO" },
                "services": [] 
             }
-        }
+        }))
 
     try:
-        import google.generativeai as genai
-        from prompts import SYSTEM_PROMPT, USER_PROMPT_TEMPLATE
-        
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
+        prompt = prompt_registry.get("research", request.prompt_version)
+
         # Inject custom instructions
         instructions = request.user_instructions if request.user_instructions else "Estrai il report completo."
         
-        full_prompt = f"{SYSTEM_PROMPT}\n\n{USER_PROMPT_TEMPLATE.format(location_name=request.location_name, user_instructions=instructions)}"
+        full_prompt = prompt.render(location_name=request.location_name, user_instructions=instructions)
         
-        response = model.generate_content(
-            full_prompt,
-            generation_config={"response_mime_type": "application/json"}
-        )
-        text_response = response.text
+        completion = await router.generate("research", full_prompt)
+        text_response = completion.text
         
+        print(f"DEBUG - research@{prompt.version} {completion.provider}:{completion.model} answered in {completion.latency:.1f}s (hedged: {completion.hedged})")
         print(f"DEBUG - Raw AI Response: {text_response}")
         
-        # Robust cleanup to extract JSON if wrapped in markdown blocks
-        import re
-        # Remove markdown code blocks
-        clean_text = re.sub(r'```[a-zA-Z]*', '', text_response).replace('```', '').strip()
-        
-        # Try to find first { and last } if heavy text around
-        start_idx = clean_text.find('{')
-        end_idx = clean_text.rfind('}')
-        if start_idx != -1 and end_idx != -1:
-            clean_text = clean_text[start_idx:end_idx+1]
-        
-        # Remove common JSON errors like trailing commas
-        clean_text = re.sub(r',\s*([}\]])', r'\1', clean_text)
-            
-        print(f"DEBUG - Cleaned AI Response (for JSON parsing): {clean_text[:500]}... [TRUNCATED]")
-
-        import json
+        # Robust cleanup to extract JSON if wrapped in markdown blocks, repairing common errors
         try:
-            data = json.loads(clean_text)
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error (First Attempt): {e}")
-            try:
-                # Attempt to repair common JSON issues
-                # 1. Missing comma between objects: } { -> }, {
-                repair_text = re.sub(r'}\s*{', '}, {', clean_text)
-                repair_text = re.sub(r']\s*{', '], {', repair_text)
-                 # 2. Fix trailing commas (again, to be safe)
-                repair_text = re.sub(r',\s*([}\]])', r'\1', repair_text)
-                # 3. Unescaped control characters
-                repair_text = repair_text.replace('\n', ' ').replace('\t', ' ')
-                
-                print("Attempting to parse repaired JSON...")
-                data = json.loads(repair_text)
-                print("Repaired JSON parsed successfully!")
-            except Exception as e2:
-                print(f"JSON Repair Failed: {e2}")
-                # Log the broken text for debugging
-                with open("broken_json.log", "w") as f:
-                    f.write(clean_text)
-                raise e # Raise original error if repair fails
+            parsed = parse_model_json(text_response)
+        except json.JSONDecodeError:
+            # Log the broken text for debugging
+            with open("broken_json.log", "w") as f:
+                f.write(clean_model_json(text_response))
+            raise
+        if parsed.repaired:
+            print("Repaired JSON parsed successfully!")
         
-        return {
-            "status": "success",
-            "data": {
-                "name": request.location_name,
-                **data
-            }
-        }
+        # Pass the validated model output through as-is instead of re-encoding it
+        return cached_response("research", request, http_request, success_envelope(
+            merge_object({"name": request.location_name}, parsed.raw, parsed.data),
+            prompt=prompt.meta,
+            model=f"{completion.provider}:{completion.model}",
+        ))
 
     except Exception as e:
         import traceback
@@ -203,19 +199,11 @@ async def research_location(request: ScrapeRequest):
         }
 
 @app.post("/api/ai/generate-tags")
-async def generate_tags(request: TagGenRequest):
-    load_dotenv()
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
+async def generate_tags(request: TagGenRequest, http_request: Request):
+    if not router.available("generate-tags"):
         return {"status": "error", "message": "API Key missing"}
 
     try:
-        import google.generativeai as genai
-        import json
-        
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
         # Prepare context from existing data
         context = f"Location: {request.location_name}\n"
         if request.description:
@@ -226,114 +214,27 @@ async def generate_tags(request: TagGenRequest):
         target_lang = "Italian" if request.language == "it" else "English"
         
         if request.mode == "wizard":
-            prompt = f"""
-            Analyze the following data about the mountain location "{request.location_name}":
-            {context}
-            
-            Goal: Evaluate and weight ALL Match Wizard Tags.
-            
-            ### MATCH WIZARD TAGS SCORING
-            For EVERY tag ID listed below, you MUST:
-            1. Assign a relevance weight (0-100) for EACH ID based on the location data
-            2. Return weights for ALL IDs listed below (mandatory)
-            3. Select the top 3-4 most relevant IDs per category
-            
-            MANDATORY IDs (Include ALL of these in 'weights'):
-            - vibe: relax, sport, party, luxury, nature, tradition, work, silence
-            - target: family, couple, friends, solo
-            - activities: ski, hiking, wellness, food, culture, adrenaline, shopping, photography
-            
-            Required format (strictly JSON):
-            {{
-                "weights": {{
-                    "vibe": {{"relax": 90, "sport": 10, "party": 5, "luxury": 30, "nature": 80, "tradition": 60, "work": 15, "silence": 70}},
-                    "target": {{"family": 70, "couple": 30, "friends": 40, "solo": 20}},
-                    "activities": {{"ski": 100, "hiking": 50, "wellness": 40, "food": 60, "culture": 30, "adrenaline": 20, "shopping": 10, "photography": 45}}
-                }},
-                "selected": {{
-                    "vibe": ["relax", "nature", "silence"],
-                    "target": ["family"],
-                    "activities": ["ski", "food", "hiking", "wellness"]
-                }}
-            }}
-            
-            IMPORTANT: The 'weights' object MUST contain ALL 20 IDs listed above (8 vibe + 4 target + 8 activities).
-            Respond ONLY with a valid JSON object. No markdown.
-            """
+            prompt_id = "tags-wizard"
         elif request.mode == "seo":
-            prompt = f"""
-            Analyze the following data about the mountain location "{request.location_name}":
-            {context}
-            
-            Goal: Provide structured SEO and descriptive tags in {target_lang}.
-            
-            ### SEO & EXTRA TAGS (FREE TEXT)
-            Provide keyword lists. Max 5-8 tags per category. Use {target_lang}.
-            - highlights: Main selling points (e.g. "Ghiacciaio perenne", "Terme storiche")
-            - tourism: Specific activities (e.g. "MTB", "Freeride", "Nordic Walking")
-            - accommodation: Types of stays (e.g. "Eco-rifugi", "Dormire in botte")
-            - infrastructure: Facilities (e.g. "Impianti moderni", "Skibus gratuito")
-            - sport: Sports available (e.g. "Padel", "Tennis", "Ice Climbing")
-            - info: Useful tourist info (e.g. "App dedicata", "WiFi in quota")
-            - general: Generic descriptive tags (e.g. "Panoramico", "Soleggiato")
-            
-            Required format (strictly JSON):
-            {{
-                "highlights": ["Tag 1", "Tag 2"],
-                "tourism": ["Tag 1", "Tag 2"],
-                "accommodation": ["Tag 1", "Tag 2"],
-                "infrastructure": ["Tag 1", "Tag 2"],
-                "sport": ["Tag 1", "Tag 2"],
-                "info": ["Tag 1", "Tag 2"],
-                "general": ["Tag 1", "Tag 2"]
-            }}
-            
-            Respond ONLY with a valid JSON object. No markdown.
-            """
+            prompt_id = "tags-seo"
         else: # Full mode (backward compatibility)
-            prompt = f"""
-            Analyze the following data about the mountain location "{request.location_name}":
-            {context}
-            
-            Goal: Provide all structured TAGS for this location.
-            
-            Required format (strictly JSON):
-            {{
-                "vibe": ["id1", "id2"],
-                "target": ["id1", "id2"],
-                "activities": ["id1", "id2"],
-                "highlights": ["Tag 1", "Tag 2"],
-                "tourism": ["Tag 1", "Tag 2"],
-                "accommodation": ["Tag 1", "Tag 2"],
-                "infrastructure": ["Tag 1", "Tag 2"],
-                "sport": ["Tag 1", "Tag 2"],
-                "info": ["Tag 1", "Tag 2"],
-                "general": ["Tag 1", "Tag 2"]
-            }}
-            
-            Respond ONLY with a valid JSON object. No markdown.
-            """
+            prompt_id = "tags-full"
+        prompt = prompt_registry.get(prompt_id, request.prompt_version)
         
-        response = model.generate_content(
-            prompt,
-            generation_config={"response_mime_type": "application/json"}
+        completion = await router.generate(
+            "generate-tags",
+            prompt.render(location_name=request.location_name, context=context, target_lang=target_lang)
         )
-        text_response = response.text
+        text_response = completion.text
         
+        print(f"DEBUG - TAGS {prompt_id}@{prompt.version} {completion.provider}:{completion.model} answered in {completion.latency:.1f}s")
         print(f"DEBUG - TAGS Raw Response: {text_response}")
         
-        clean_text = text_response.replace('```json', '').replace('```', '').strip()
-        start_idx = clean_text.find('{')
-        end_idx = clean_text.rfind('}')
-        if start_idx != -1 and end_idx != -1:
-            clean_text = clean_text[start_idx:end_idx+1]
-        
-        # Fix trailing commas
-        clean_text = re.sub(r',\s*([}\]])', r'\1', clean_text)
-            
-        data = json.loads(clean_text)
-        
-        return {"status": "success", "data": data}
+        parsed = parse_model_json(text_response)
+
+        return cached_response("generate-tags", request, http_request, success_envelope(
+            parsed.raw, prompt=prompt.meta, model=f"{completion.provider}:{completion.model}"
+        ))
 
     except Exception as e:
         print(f"Tag Gen Error: {e}")
@@ -343,54 +244,34 @@ async def generate_tags(request: TagGenRequest):
 class TranslateRequest(BaseModel):
     content: dict
     target_language: str = "Italian"
+    prompt_version: Optional[str] = None
 
 @app.post("/api/ai/translate")
-async def translate_content(request: TranslateRequest):
-    load_dotenv()
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
+async def translate_content(request: TranslateRequest, http_request: Request):
+    if not router.available("translate"):
         return {"status": "error", "message": "API Key missing"}
 
     try:
-        import google.generativeai as genai
-        import json
-        
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
+        prompt = prompt_registry.get("translate", request.prompt_version)
+
         # Serialize content to string for the prompt
         content_str = json.dumps(request.content, ensure_ascii=False)
         
-        prompt = f"""
-        You are a professional translator for a mountain tourism portal.
-        
-        Task: Translate the following JSON content into {request.target_language}.
-        
-        Rules:
-        1. Translate ALL values (descriptions, names where appropriate, labels).
-        2. DO NOT translate Keys. Keep the JSON structure exactly the same.
-        3. If a value is a URL or a number, keep it as is.
-        4. Output ONLY valid JSON. No markdown.
-        
-        Content to translate:
-        {content_str}
-        """
-        
-        response = model.generate_content(prompt)
-        text_response = response.text
+        completion = await router.generate(
+            "translate",
+            prompt.render(target_language=request.target_language, content=content_str),
+            json_mode=False
+        )
+        text_response = completion.text
         
+        print(f"DEBUG - TRANSLATE translate@{prompt.version} {completion.provider}:{completion.model} answered in {completion.latency:.1f}s")
         print(f"DEBUG - TRANSLATE Raw Response: {text_response}")
         
-        import re
-        clean_text = re.sub(r'```[a-zA-Z]*', '', text_response).replace('```', '').strip()
-        start_idx = clean_text.find('{')
-        end_idx = clean_text.rfind('}')
-        if start_idx != -1 and end_idx != -1:
-            clean_text = clean_text[start_idx:end_idx+1]
-            
-        data = json.loads(clean_text)
-        
-        return {"status": "success", "data": data}
+        parsed = parse_model_json(text_response)
+
+        return cached_response("translate", request, http_request, success_envelope(
+            parsed.raw, prompt=prompt.meta, model=f"{completion.provider}:{completion.model}"
+        ))
 
     except Exception as e:
         print(f"Translation Error: {e}")
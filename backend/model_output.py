@@ -0,0 +1,63 @@
+"""
+Extraction of the JSON object from raw model output, with the repair pass the
+research endpoint has always applied. Shared by the API and the benchmark so
+parse/repair rates measured offline match production.
+"""
+import json
+import re
+from dataclasses import dataclass
+
+from responses import loads
+
+
+@dataclass
+class ParsedOutput:
+    data: object
+    # The validated JSON text, passed through to the client without re-encoding
+    raw: bytes
+    repaired: bool = False
+
+
+def clean_model_json(text_response: str) -> str:
+    # Remove markdown code blocks
+    clean_text = re.sub(r'```[a-zA-Z]*', '', text_response).replace('```', '').strip()
+
+    # Try to find first { and last } if heavy text around
+    start_idx = clean_text.find('{')
+    end_idx = clean_text.rfind('}')
+    if start_idx != -1 and end_idx != -1:
+        clean_text = clean_text[start_idx:end_idx+1]
+
+    # Remove common JSON errors like trailing commas
+    return re.sub(r',\s*([}\]])', r'\1', clean_text)
+
+
+def repair_model_json(clean_text: str) -> str:
+    # 1. Missing comma between objects: } { -> }, {
+    repair_text = re.sub(r'}\s*{', '}, {', clean_text)
+    repair_text = re.sub(r']\s*{', '], {', repair_text)
+    # 2. Fix trailing commas (again, to be safe)
+    repair_text = re.sub(r',\s*([}\]])', r'\1', repair_text)
+    # 3. Unescaped control characters
+    return repair_text.replace('\n', ' ').replace('\t', ' ')
+
+
+def parse_model_json(text_response: str, repair: bool = True) -> ParsedOutput:
+    """
+    Parse the JSON object in a model response. Raises the original
+    JSONDecodeError when neither the cleaned nor the repaired text parses.
+    """
+    clean_text = clean_model_json(text_response)
+    try:
+        return ParsedOutput(data=loads(clean_text), raw=clean_text.encode("utf-8"))
+    except json.JSONDecodeError as e:
+        if not repair:
+            raise
+        print(f"JSON Parse Error (First Attempt): {e}")
+        repair_text = repair_model_json(clean_text)
+        try:
+            data = loads(repair_text)
+        except json.JSONDecodeError as e2:
+            print(f"JSON Repair Failed: {e2}")
+            raise e
+        return ParsedOutput(data=data, raw=repair_text.encode("utf-8"), repaired=True)
@@ -0,0 +1,143 @@
+"""
+Registry of versioned prompts.
+
+Every prompt has an ID and a version; endpoints pick a version per request
+(falling back to the default) and record it alongside the result, so prompt
+variants can be compared with the offline benchmark (see benchmark.py).
+"""
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import prompts
+import prompts_tags
+import prompts_translate
+import prompts_v1
+import prompts_v2_copy
+
+
+def _example_json(text: str) -> Optional[dict]:
+    """First JSON object with more than one key embedded in a prompt, if any."""
+    start = text.find('{')
+    while start != -1:
+        depth = 0
+        for end in range(start, len(text)):
+            if text[end] == '{':
+                depth += 1
+            elif text[end] == '}':
+                depth -= 1
+                if depth == 0:
+                    try:
+                        example = json.loads(text[start:end+1])
+                        if isinstance(example, dict) and len(example) > 1:
+                            return example
+                    except json.JSONDecodeError:
+                        pass
+                    break
+        start = text.find('{', start + 1)
+    return None
+
+
+@dataclass
+class Prompt:
+    id: str
+    version: str
+    template: str
+    # Sent verbatim before the template; may contain literal braces
+    system: str = ""
+    description: str = ""
+
+    def render(self, **kwargs) -> str:
+        body = self.template.format(**kwargs)
+        return f"{self.system}\n\n{body}" if self.system else body
+
+    @property
+    def schema(self) -> Optional[dict]:
+        """The example output embedded in the prompt, used to score schema completeness."""
+        if self.system:
+            return _example_json(self.system)
+        return _example_json(self.template.replace("{{", "{").replace("}}", "}"))
+
+    @property
+    def meta(self) -> dict:
+        return {"id": self.id, "version": self.version}
+
+
+class PromptRegistry:
+    def __init__(self):
+        self._prompts: Dict[str, Dict[str, Prompt]] = {}
+        self._defaults: Dict[str, str] = {}
+
+    def register(self, prompt: Prompt, default: bool = False):
+        self._prompts.setdefault(prompt.id, {})[prompt.version] = prompt
+        if default or prompt.id not in self._defaults:
+            self._defaults[prompt.id] = prompt.version
+
+    def get(self, prompt_id: str, version: Optional[str] = None) -> Prompt:
+        if prompt_id not in self._prompts:
+            raise ValueError(f"Unknown prompt '{prompt_id}'")
+        version = version or self._defaults[prompt_id]
+        if version not in self._prompts[prompt_id]:
+            raise ValueError(
+                f"Unknown version '{version}' for prompt '{prompt_id}' "
+                f"(available: {', '.join(self.versions(prompt_id))})"
+            )
+        return self._prompts[prompt_id][version]
+
+    def ids(self) -> List[str]:
+        return list(self._prompts)
+
+    def versions(self, prompt_id: str) -> List[str]:
+        return list(self._prompts.get(prompt_id, {}))
+
+    def default_version(self, prompt_id: str) -> str:
+        return self._defaults[prompt_id]
+
+
+registry = PromptRegistry()
+
+registry.register(Prompt(
+    id="research",
+    version="v1.0.0",
+    system=prompts_v1.SYSTEM_PROMPT,
+    template=prompts_v1.USER_PROMPT_TEMPLATE,
+    description="Seasonal descriptions and an extended list of services",
+))
+registry.register(Prompt(
+    id="research",
+    version="v1.2.0",
+    system=prompts.SYSTEM_PROMPT,
+    template=prompts.USER_PROMPT_TEMPLATE,
+    description="Adds tags, technical data and accessibility",
+), default=True)
+registry.register(Prompt(
+    id="research",
+    version="v2.0.0",
+    system=prompts_v2_copy.SYSTEM_PROMPT,
+    template=prompts_v2_copy.USER_PROMPT_TEMPLATE,
+    description="Full report: profile, parking, mobility, medical, skiing, family and more",
+))
+registry.register(Prompt(
+    id="tags-wizard",
+    version="v1.0.0",
+    template=prompts_tags.WIZARD_PROMPT_TEMPLATE,
+    description="Weights for all Match Wizard tag IDs",
+))
+registry.register(Prompt(
+    id="tags-seo",
+    version="v1.0.0",
+    template=prompts_tags.SEO_PROMPT_TEMPLATE,
+    description="Free-text SEO and descriptive tags",
+))
+registry.register(Prompt(
+    id="tags-full",
+    version="v1.0.0",
+    template=prompts_tags.FULL_PROMPT_TEMPLATE,
+    description="All structured tags (backward compatibility)",
+))
+registry.register(Prompt(
+    id="translate",
+    version="v1.0.0",
+    template=prompts_translate.TRANSLATE_PROMPT_TEMPLATE,
+    description="JSON-preserving translation",
+))
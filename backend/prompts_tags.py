@@ -0,0 +1,87 @@
+WIZARD_PROMPT_TEMPLATE = """
+Analyze the following data about the mountain location "{location_name}":
+{context}
+
+Goal: Evaluate and weight ALL Match Wizard Tags.
+
+### MATCH WIZARD TAGS SCORING
+For EVERY tag ID listed below, you MUST:
+1. Assign a relevance weight (0-100) for EACH ID based on the location data
+2. Return weights for ALL IDs listed below (mandatory)
+3. Select the top 3-4 most relevant IDs per category
+
+MANDATORY IDs (Include ALL of these in 'weights'):
+- vibe: relax, sport, party, luxury, nature, tradition, work, silence
+- target: family, couple, friends, solo
+- activities: ski, hiking, wellness, food, culture, adrenaline, shopping, photography
+
+Required format (strictly JSON):
+{{
+    "weights": {{
+        "vibe": {{"relax": 90, "sport": 10, "party": 5, "luxury": 30, "nature": 80, "tradition": 60, "work": 15, "silence": 70}},
+        "target": {{"family": 70, "couple": 30, "friends": 40, "solo": 20}},
+        "activities": {{"ski": 100, "hiking": 50, "wellness": 40, "food": 60, "culture": 30, "adrenaline": 20, "shopping": 10, "photography": 45}}
+    }},
+    "selected": {{
+        "vibe": ["relax", "nature", "silence"],
+        "target": ["family"],
+        "activities": ["ski", "food", "hiking", "wellness"]
+    }}
+}}
+
+IMPORTANT: The 'weights' object MUST contain ALL 20 IDs listed above (8 vibe + 4 target + 8 activities).
+Respond ONLY with a valid JSON object. No markdown.
+"""
+
+SEO_PROMPT_TEMPLATE = """
+Analyze the following data about the mountain location "{location_name}":
+{context}
+
+Goal: Provide structured SEO and descriptive tags in {target_lang}.
+
+### SEO & EXTRA TAGS (FREE TEXT)
+Provide keyword lists. Max 5-8 tags per category. Use {target_lang}.
+- highlights: Main selling points (e.g. "Ghiacciaio perenne", "Terme storiche")
+- tourism: Specific activities (e.g. "MTB", "Freeride", "Nordic Walking")
+- accommodation: Types of stays (e.g. "Eco-rifugi", "Dormire in botte")
+- infrastructure: Facilities (e.g. "Impianti moderni", "Skibus gratuito")
+- sport: Sports available (e.g. "Padel", "Tennis", "Ice Climbing")
+- info: Useful tourist info (e.g. "App dedicata", "WiFi in quota")
+- general: Generic descriptive tags (e.g. "Panoramico", "Soleggiato")
+
+Required format (strictly JSON):
+{{
+    "highlights": ["Tag 1", "Tag 2"],
+    "tourism": ["Tag 1", "Tag 2"],
+    "accommodation": ["Tag 1", "Tag 2"],
+    "infrastructure": ["Tag 1", "Tag 2"],
+    "sport": ["Tag 1", "Tag 2"],
+    "info": ["Tag 1", "Tag 2"],
+    "general": ["Tag 1", "Tag 2"]
+}}
+
+Respond ONLY with a valid JSON object. No markdown.
+"""
+
+FULL_PROMPT_TEMPLATE = """
+Analyze the following data about the mountain location "{location_name}":
+{context}
+
+Goal: Provide all structured TAGS for this location.
+
+Required format (strictly JSON):
+{{
+    "vibe": ["id1", "id2"],
+    "target": ["id1", "id2"],
+    "activities": ["id1", "id2"],
+    "highlights": ["Tag 1", "Tag 2"],
+    "tourism": ["Tag 1", "Tag 2"],
+    "accommodation": ["Tag 1", "Tag 2"],
+    "infrastructure": ["Tag 1", "Tag 2"],
+    "sport": ["Tag 1", "Tag 2"],
+    "info": ["Tag 1", "Tag 2"],
+    "general": ["Tag 1", "Tag 2"]
+}}
+
+Respond ONLY with a valid JSON object. No markdown.
+"""
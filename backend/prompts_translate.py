@@ -0,0 +1,14 @@
+TRANSLATE_PROMPT_TEMPLATE = """
+You are a professional translator for a mountain tourism portal.
+
+Task: Translate the following JSON content into {target_language}.
+
+Rules:
+1. Translate ALL values (descriptions, names where appropriate, labels).
+2. DO NOT translate Keys. Keep the JSON structure exactly the same.
+3. If a value is a URL or a number, keep it as is.
+4. Output ONLY valid JSON. No markdown.
+
+Content to translate:
+{content}
+"""
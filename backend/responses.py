@@ -0,0 +1,200 @@
+"""
+Fast JSON serialization and compressed, cacheable responses for the AI endpoints.
+
+Research payloads are tens of KB of nested JSON, so they are encoded once with
+orjson (falling back to the stdlib when it is not installed), compressed with
+brotli or gzip according to Accept-Encoding, and tagged with an ETag.
+
+The AI endpoints are POSTs and always run the model, so they never answer 304.
+Each result is kept in a ResultCache keyed by the request and can be fetched
+again with a conditional GET, which returns 304 when If-None-Match matches.
+"""
+import gzip
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Below this size compression costs more than it saves on the wire
+MIN_COMPRESS_SIZE = 1024
+
+
+def loads(data):
+    """Parse JSON text or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(content) -> bytes:
+    """Serialize content to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def merge_object(head: dict, body: bytes, parsed: dict) -> bytes:
+    """
+    Splice the keys of `head` in front of an already validated JSON object
+    (`body`, whose parsed form is `parsed`), so model output is passed through
+    without re-encoding it. Keys already present in `parsed` win, matching
+    `{**head, **parsed}`.
+    """
+    if not isinstance(parsed, dict):
+        raise TypeError(f"Expected a JSON object, got {type(parsed).__name__}")
+    head = {key: value for key, value in head.items() if key not in parsed}
+    if not head:
+        return body
+    inner = body.strip()[1:-1].strip()
+    prefix = dumps(head)[:-1]
+    if not inner:
+        return prefix + b"}"
+    return prefix + b"," + inner + b"}"
+
+
+def success_envelope(data: bytes, **meta) -> bytes:
+    """
+    Wrap pre-encoded JSON in the `{"status": "success", "data": ...}` envelope.
+    Extra keyword arguments (e.g. the prompt version) are added next to `data`.
+    """
+    head = dumps({"status": "success", **meta})[:-1]
+    return head + b',"data":' + data + b"}"
+
+
+def _accepted_encodings(header: str) -> dict:
+    encodings = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[token] = quality
+    return encodings
+
+
+def negotiate_encoding(header: str):
+    """Pick 'br', 'gzip' or None from an Accept-Encoding header value."""
+    encodings = _accepted_encodings(header or "")
+    wildcard = encodings.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = encodings.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compute_etag(body: bytes) -> str:
+    # Weak, since the same JSON is served with different Content-Encodings
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+class ResultCache:
+    """In-memory LRU of encoded AI results, keyed by endpoint and request body."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key_for(endpoint: str, payload: dict) -> str:
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(f"{endpoint}\n{canonical}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def put(self, key: str, body: bytes):
+        self._entries[key] = (time.monotonic() + self.ttl, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, body = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return body
+
+
+class AIResponse(Response):
+    """
+    JSON response that accepts either a Python object or pre-encoded JSON
+    bytes, negotiates brotli/gzip and, for GET/HEAD only, honours If-None-Match.
+    """
+    media_type = "application/json"
+
+    def __init__(self, content=None, request: Request = None, status_code: int = 200, headers: dict = None):
+        self._request = request
+        super().__init__(content=content, status_code=status_code, headers=headers)
+
+    def render(self, content) -> bytes:
+        body = content if isinstance(content, (bytes, bytearray)) else dumps(content)
+        request = self._request
+        if request is None:
+            return body
+
+        etag = compute_etag(body)
+        self._extra_headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+
+        # RFC 9110: a matching If-None-Match is only answered with 304 on GET/HEAD
+        if request.method in ("GET", "HEAD") and etag_matches(request.headers.get("if-none-match"), etag):
+            self.status_code = 304
+            return b""
+
+        if len(body) < MIN_COMPRESS_SIZE:
+            return body
+
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding == "br":
+            body = brotli.compress(body, quality=5)
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=6)
+        if encoding:
+            self._extra_headers["Content-Encoding"] = encoding
+        return body
+
+    def init_headers(self, headers=None) -> None:
+        super().init_headers(headers)
+        for name, value in getattr(self, "_extra_headers", {}).items():
+            self.raw_headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+        if self.status_code == 304:
+            # A 304 carries no body, so drop the Content-Length/Type starlette added
+            self.raw_headers = [
+                (k, v) for k, v in self.raw_headers if k not in (b"content-length", b"content-type")
+            ]
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+
+import benchmark
+from llm import FakeProvider, estimate_tokens
+from model_output import parse_model_json
+from prompt_registry import registry
+
+
+@pytest.mark.parametrize("scenario, status", [
+    ("clean", "parsed"),
+    ("fenced", "parsed"),
+    ("trailing-commas", "parsed"),
+    ("missing-fields", "parsed"),
+    ("control-chars", "repaired"),
+    ("unparseable", "failed"),
+])
+def test_stub_scenarios(scenario, status):
+    schema = registry.get("research", "v1.2.0").schema
+    text = benchmark.stub_output(scenario, schema)
+    try:
+        parsed = parse_model_json(text)
+    except json.JSONDecodeError:
+        assert status == "failed"
+        return
+    assert status == ("repaired" if parsed.repaired else "parsed")
+    completeness = benchmark.schema_completeness(schema, parsed.data)
+    assert completeness < 1.0 if scenario == "missing-fields" else completeness == 1.0
+
+
+def test_translate_completeness_uses_input_keys():
+    prompt = registry.get("translate")
+    schema = benchmark.expected_schema(prompt, "Livigno")
+    assert benchmark.schema_completeness(schema, {"name": "Livigno"}) == 0.5
+
+
+def test_stub_run_reports_pinned_model():
+    prompt = registry.get("tags-wizard")
+    row = asyncio.run(benchmark.run_variant(prompt, benchmark.LOCATIONS[:1], "stub"))
+    assert row["models"] == ["fake:stub"]
+    assert row["runs"] == len(benchmark.STUB_SCENARIOS)
+    assert row["synthetic"]
+    assert row["latency_p50"] > 0
+
+
+def test_stub_runs_every_scenario_for_every_variant():
+    rows = [
+        asyncio.run(benchmark.run_variant(registry.get("research", version), benchmark.LOCATIONS[:1], "stub"))
+        for version in registry.versions("research")
+    ]
+    shares = {(row["parsed"], row["repaired"], row["failed"]) for row in rows}
+    assert len(shares) == 1
+
+
+def test_completeness_target_is_shared_across_versions():
+    v1, v2 = registry.get("research", "v1.0.0"), registry.get("research", "v2.0.0")
+    assert benchmark.expected_schema(v1, "Livigno") == benchmark.expected_schema(v2, "Livigno")
+    assert benchmark.expected_schema(v1, "Livigno") == registry.get("research").schema
+
+
+def test_fake_completions_use_the_same_token_estimate():
+    text = json.dumps(registry.get("research").schema)
+    provider = FakeProvider(default=text)
+    completion = asyncio.run(provider.generate("m", "prompt"))
+    assert completion.output_tokens == estimate_tokens(text)
@@ -0,0 +1,206 @@
+import asyncio
+import time
+
+import pytest
+
+import llm
+from llm import FakeProvider, Route, Router
+
+
+def make_router(primary, alternate=None, deadline=2.0, hedge_after=0.05, hedge_budget=0.1):
+    providers = {"a": primary}
+    tiers = [("a", "m1")]
+    if alternate is not None:
+        providers["b"] = alternate
+        tiers.append(("b", "m2"))
+    route = Route(tiers=tiers, deadline=deadline, default_hedge_after=hedge_after)
+    return Router(providers, {"t": route}, hedge_budget=hedge_budget)
+
+
+def test_hedges_to_alternate_when_primary_is_slow():
+    slow = FakeProvider("a", responses={"m1": "slow"}, delays={"m1": 0.5})
+    fast = FakeProvider("b", responses={"m2": "fast"}, delays={"m2": 0.01})
+    router = make_router(slow, fast)
+
+    completion = asyncio.run(router.generate("t", "prompt"))
+
+    assert completion.text == "fast"
+    assert completion.hedged
+    assert len(router.budgets["t"].hedges) == 1
+    # Latency is measured from the start of the request, not of the winning hedge
+    assert completion.latency >= 0.05
+
+
+def test_no_hedge_when_primary_answers_in_time():
+    primary = FakeProvider("a", responses={"m1": "primary"}, delays={"m1": 0.01})
+    alternate = FakeProvider("b", responses={"m2": "alternate"})
+    router = make_router(primary, alternate, hedge_after=0.2)
+
+    completion = asyncio.run(router.generate("t", "prompt"))
+
+    assert completion.text == "primary"
+    assert not completion.hedged
+    assert alternate.calls == []
+
+
+def test_hedge_budget_caps_hedged_calls():
+    slow = FakeProvider("a", responses={"m1": "slow"}, delays={"m1": 0.05})
+    fast = FakeProvider("b", responses={"m2": "fast"}, delays={"m2": 0.2})
+    router = make_router(slow, fast, hedge_after=0.01, hedge_budget=0.1)
+
+    async def run():
+        for _ in range(10):
+            await router.generate("t", "prompt")
+
+    asyncio.run(run())
+
+    assert len(router.budgets["t"].calls) == 10
+    assert len(router.budgets["t"].hedges) == 1
+    assert len(fast.calls) == 1
+
+
+def test_deadline_expires():
+    slow = FakeProvider("a", delays={"m1": 1.0})
+    router = make_router(slow, deadline=0.1)
+
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(router.generate("t", "prompt"))
+    assert time.monotonic() - started < 0.5
+
+
+def test_falls_back_after_failure():
+    broken = FakeProvider("a", responses={"m1": RuntimeError("boom")})
+    fallback = FakeProvider("b", responses={"m2": "fallback"})
+    router = make_router(broken, fallback, hedge_after=10.0)
+
+    completion = asyncio.run(router.generate("t", "prompt"))
+
+    assert completion.text == "fallback"
+    assert not completion.hedged
+    assert len(router.budgets["t"].hedges) == 0
+
+
+def test_raises_when_all_tiers_fail():
+    broken = FakeProvider("a", responses={"m1": RuntimeError("boom")})
+    router = make_router(broken)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(router.generate("t", "prompt"))
+
+
+def test_stats_are_kept_per_endpoint():
+    provider = FakeProvider("a")
+    route = Route(tiers=[("a", "m1")], deadline=1.0, default_hedge_after=0.5)
+    router = Router({"a": provider}, {"fast": route, "slow": route})
+
+    router._stats("slow", ("a", "m1")).latencies.extend([30.0] * 10)
+
+    assert router._expected_latency("slow", ("a", "m1")) == 30.0
+    assert router._expected_latency("fast", ("a", "m1")) == 0.5
+
+
+def test_candidates_keep_configured_order_when_alternate_is_faster():
+    router = make_router(FakeProvider("a"), FakeProvider("b"))
+    assert router.candidates("t") == [("a", "m1"), ("b", "m2")]
+
+    # A faster alternate does not displace the preferred (e.g. stronger) tier
+    router._stats("t", ("a", "m1")).latencies.extend([1.5] * 10)
+    router._stats("t", ("b", "m2")).latencies.extend([0.01] * 10)
+    assert router.candidates("t") == [("a", "m1"), ("b", "m2")]
+
+
+def test_candidates_demote_tier_over_slo():
+    router = make_router(FakeProvider("a"), FakeProvider("b"), deadline=2.0)
+    router.routes["t"].slo = 1.0
+
+    router._stats("t", ("a", "m1")).latencies.extend([1.5] * 10)
+    assert router.candidates("t") == [("b", "m2"), ("a", "m1")]
+
+    # An open circuit breaker outranks the SLO
+    router._stats("t", ("b", "m2")).open_until = time.monotonic() + 60
+    assert router.candidates("t") == [("a", "m1"), ("b", "m2")]
+
+
+def test_hedge_target_is_fastest_alternate():
+    route = Route(tiers=[("a", "m1"), ("b", "m2"), ("c", "m3")], deadline=2.0, default_hedge_after=0.05)
+    providers = {
+        "a": FakeProvider("a", responses={"m1": "primary"}, delays={"m1": 0.5}),
+        "b": FakeProvider("b", responses={"m2": "slow"}, delays={"m2": 0.3}),
+        "c": FakeProvider("c", responses={"m3": "fast"}, delays={"m3": 0.01}),
+    }
+    router = Router(providers, {"t": route}, hedge_budget=1.0)
+    router._stats("t", ("b", "m2")).latencies.extend([0.3] * 10)
+    router._stats("t", ("c", "m3")).latencies.extend([0.01] * 10)
+
+    completion = asyncio.run(router.generate("t", "prompt"))
+
+    assert completion.text == "fast"
+    assert providers["b"].calls == []
+
+
+def test_losing_hedge_does_not_flip_ranking():
+    primary = FakeProvider("a", responses={"m1": "primary"}, delays={"m1": 0.12})
+    alternate = FakeProvider("b", responses={"m2": "alternate"}, delays={"m2": 1.0})
+    router = make_router(primary, alternate, hedge_after=0.1, hedge_budget=1.0)
+
+    async def run():
+        return [await router.generate("t", "prompt") for _ in range(12)]
+
+    completions = asyncio.run(run())
+
+    assert all(c.text == "primary" for c in completions)
+    assert len(alternate.calls) >= 10
+    # Cancelled hedges are lower bounds, not latency samples
+    assert len(router._stats("t", ("b", "m2")).latencies) == 0
+    assert len(router._stats("t", ("b", "m2")).cancelled) == len(alternate.calls)
+    assert router.candidates("t") == [("a", "m1"), ("b", "m2")]
+
+
+def test_hedge_budget_is_per_endpoint():
+    route = Route(tiers=[("a", "m1"), ("b", "m2")], deadline=2.0, default_hedge_after=0.01)
+    slow = FakeProvider("a", responses={"m1": "slow"}, delays={"m1": 0.05})
+    fast = FakeProvider("b", responses={"m2": "fast"}, delays={"m2": 0.2})
+    router = Router({"a": slow, "b": fast}, {"research": route, "tags": route}, hedge_budget=0.1)
+
+    async def run():
+        await router.generate("research", "prompt")
+        await router.generate("tags", "prompt")
+
+    asyncio.run(run())
+
+    assert len(router.budgets["research"].hedges) == 1
+    assert len(router.budgets["tags"].hedges) == 1
+
+
+def test_hedge_budget_window_rolls(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm.time, "monotonic", lambda: now[0])
+    budget = llm.HedgeBudget(0.1, window=60.0)
+
+    budget.record_call()
+    assert budget.try_hedge()
+    budget.record_call()
+    assert not budget.try_hedge()
+
+    now[0] += 61
+    budget.record_call()
+    assert budget.try_hedge()
+
+
+@pytest.mark.parametrize("value", ["gemini-2.5-pro,openai:gpt-4.1", "gemini:gemini-2.5-pro,anthropic:x"])
+def test_build_router_rejects_bad_model_overrides(monkeypatch, value):
+    monkeypatch.setenv("LLM_RESEARCH_MODELS", value)
+    with pytest.raises(ValueError, match="LLM_RESEARCH_MODELS"):
+        llm.build_router()
+
+
+def test_build_router_with_fake_providers(monkeypatch):
+    monkeypatch.setenv("LLM_FAKE", "1")
+    monkeypatch.delenv("LLM_RESEARCH_MODELS", raising=False)
+    router = llm.build_router()
+
+    assert all(isinstance(provider, FakeProvider) for provider in router.providers.values())
+    assert router.available("research")
+    completion = asyncio.run(router.generate("research", "prompt"))
+    assert (completion.provider, completion.model) == ("gemini", "gemini-2.5-pro")
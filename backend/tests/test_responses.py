@@ -0,0 +1,154 @@
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import responses
+from responses import AIResponse, ResultCache, merge_object, negotiate_encoding, success_envelope
+
+BODY = {"status": "success", "data": {"text": "x" * 2048}}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/result")
+    async def get_result(request: Request):
+        return AIResponse(BODY, request=request)
+
+    @app.post("/result")
+    async def post_result(request: Request):
+        return AIResponse(BODY, request=request)
+
+    return TestClient(app)
+
+
+def test_merge_object_with_empty_object():
+    assert json.loads(merge_object({"name": "X"}, b"{}", {})) == {"name": "X"}
+    assert json.loads(merge_object({"name": "X"}, b"{ }", {})) == {"name": "X"}
+
+
+def test_merge_object_keeps_model_value_for_existing_key():
+    body = b'{"name": "Model", "a": 1}'
+    merged = merge_object({"name": "X", "b": 2}, body, json.loads(body))
+    assert json.loads(merged) == {"name": "Model", "a": 1, "b": 2}
+    # No duplicate keys in the spliced bytes
+    assert merged.count(b'"name"') == 1
+
+
+def test_merge_object_with_surrounding_whitespace():
+    body = b'\n  {\n    "a": {"b": [1, 2]}\n  }\n'
+    merged = merge_object({"name": "X"}, body, json.loads(body))
+    assert json.loads(merged) == {"name": "X", "a": {"b": [1, 2]}}
+
+
+def test_merge_object_rejects_non_objects():
+    with pytest.raises(TypeError):
+        merge_object({"name": "X"}, b"[1]", [1])
+
+
+def test_success_envelope_adds_metadata():
+    envelope = success_envelope(b'{"a": 1}', prompt={"id": "research", "version": "v1.2.0"})
+    assert json.loads(envelope) == {
+        "status": "success",
+        "prompt": {"id": "research", "version": "v1.2.0"},
+        "data": {"a": 1},
+    }
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0", None),
+    ("br;q=0, *", "gzip"),
+    ("identity", None),
+    ("", None),
+    (None, None),
+])
+def test_negotiate_encoding(header, expected):
+    if responses.brotli is None:
+        pytest.skip("brotli is not installed")
+    assert negotiate_encoding(header) == expected
+
+
+def test_negotiate_encoding_without_brotli(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("br, gzip") == "gzip"
+    assert negotiate_encoding("*") == "gzip"
+
+
+def test_response_is_compressed(client):
+    response = client.get("/result", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == BODY
+
+
+def test_get_with_matching_etag_returns_304(client):
+    etag = client.get("/result").headers["etag"]
+
+    response = client.get("/result", headers={"if-none-match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert "content-length" not in response.headers
+    assert "content-type" not in response.headers
+    assert response.headers["etag"] == etag
+
+
+def test_get_with_weak_comparison_and_list(client):
+    etag = client.get("/result").headers["etag"]
+    strong = etag.removeprefix("W/")
+    response = client.get("/result", headers={"if-none-match": f'"other", {strong}'})
+    assert response.status_code == 304
+
+
+def test_get_with_stale_etag_returns_200(client):
+    response = client.get("/result", headers={"if-none-match": 'W/"stale"'})
+    assert response.status_code == 200
+    assert response.json() == BODY
+
+
+def test_post_with_matching_etag_still_returns_200(client):
+    etag = client.post("/result").headers["etag"]
+
+    response = client.post("/result", headers={"if-none-match": etag})
+
+    assert response.status_code == 200
+    assert response.json() == BODY
+
+
+def test_result_cache_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(responses.time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl=10)
+    cache.put("k", b"body")
+
+    now[0] += 9
+    assert cache.get("k") == b"body"
+    now[0] += 1
+    assert cache.get("k") is None
+
+
+def test_result_cache_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+
+
+def test_result_cache_key_ignores_field_order():
+    assert ResultCache.key_for("research", {"a": 1, "b": 2}) == ResultCache.key_for("research", {"b": 2, "a": 1})
+    assert ResultCache.key_for("research", {"a": 1}) != ResultCache.key_for("translate", {"a": 1})
+